@@ -2,6 +2,7 @@
 Исправленный GUI для УВМ с рабочим интерпретатором
 """
 
+import os
 import sys
 import tempfile
 import json
@@ -20,7 +21,11 @@ from assembler import assemble_text_to_binary
 # Импортируем UVM из interpreter_final.py
 try:
     from interpreter_final import UVM
+    from tracer import TraceReader, remove_trace_files
+    TRACE_SUPPORTED = True
 except ImportError:
+    TRACE_SUPPORTED = False
+
     # Если не импортируется, создаем UVM прямо здесь
     class UVM:
         def __init__(self, memory_size=2048):
@@ -97,6 +102,8 @@ except ImportError:
 class UVMGUI(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.trace_reader = None
+        self.trace_range = (0, 200)
         self.initUI()
         self.binary_file_path = None
         self.temp_files = []
@@ -145,9 +152,44 @@ class UVMGUI(QMainWindow):
         range_panel.addWidget(self.start_edit)
         range_panel.addWidget(QLabel("-"))
         range_panel.addWidget(self.end_edit)
+
+        self.demand_check = QCheckBox("Вычислять только нужный диапазон")
+        range_panel.addWidget(self.demand_check)
+
+        self.trace_check = QCheckBox("Записывать трассу")
+        self.trace_check.setEnabled(TRACE_SUPPORTED)
+        range_panel.addWidget(self.trace_check)
         range_panel.addStretch()
 
-        # 4. Вкладки вывода
+        # 4. Пошаговый просмотр по трассе
+        trace_panel = QHBoxLayout()
+        trace_panel.addWidget(QLabel("Шаг:"))
+
+        self.step_back_btn = QPushButton("◀")
+        self.step_back_btn.setFixedWidth(30)
+        self.step_back_btn.clicked.connect(lambda: self.step_slider.setValue(self.step_slider.value() - 1))
+
+        self.step_slider = QSlider(Qt.Horizontal)
+        self.step_slider.valueChanged.connect(self.show_step)
+
+        self.step_forward_btn = QPushButton("▶")
+        self.step_forward_btn.setFixedWidth(30)
+        self.step_forward_btn.clicked.connect(lambda: self.step_slider.setValue(self.step_slider.value() + 1))
+
+        self.step_spin = QSpinBox()
+        self.step_spin.setFixedWidth(80)
+        self.step_spin.valueChanged.connect(self.step_slider.setValue)
+        self.step_slider.valueChanged.connect(self.step_spin.setValue)
+
+        self.step_label = QLabel("из 0")
+
+        trace_panel.addWidget(self.step_back_btn)
+        trace_panel.addWidget(self.step_slider, 1)
+        trace_panel.addWidget(self.step_forward_btn)
+        trace_panel.addWidget(self.step_spin)
+        trace_panel.addWidget(self.step_label)
+
+        # 5. Вкладки вывода
         self.tabs = QTabWidget()
 
         # Вкладка регистров
@@ -173,9 +215,13 @@ class UVMGUI(QMainWindow):
         layout.addWidget(QLabel("Программа на ассемблере:"))
         layout.addWidget(self.code_edit, 2)
         layout.addLayout(range_panel)
+        layout.addLayout(trace_panel)
         layout.addWidget(QLabel("Результаты:"))
         layout.addWidget(self.tabs, 3)
 
+        # Трасса появится после первого выполнения
+        self.set_trace(None)
+
         # Загружаем тестовую программу
         self.load_spec_test()
 
@@ -264,6 +310,7 @@ ROTR 36, 48         ; Циклический сдвиг на 8
             self.log("Ошибка: сначала выполните ассемблирование", "red")
             return
 
+        trace_path = None
         try:
             # Получаем диапазон
             start = int(self.start_edit.text())
@@ -280,33 +327,30 @@ ROTR 36, 48         ; Циклический сдвиг на 8
             # Создаем и запускаем УВМ
             self.log("Запуск программы...", "blue")
             uvm = UVM(memory_size=2048)
-            uvm.run(binary_data)
+            demand = self.demand_check.isChecked() and hasattr(uvm, 'run_demand')
+            if demand and self.trace_check.isChecked():
+                self.log("Трасса не записывается: включено вычисление только нужного диапазона", "red")
+
+            if demand:
+                executed = uvm.run_demand(binary_data, start, end)
+                self.log(f"Выполнено команд (срез): {executed} из {len(binary_data) // 5}", "blue")
+            elif self.trace_check.isChecked() and TRACE_SUPPORTED:
+                trace_file = tempfile.NamedTemporaryFile(delete=False, suffix='.trace')
+                trace_file.close()
+                trace_path = trace_file.name
+                uvm.run(binary_data, trace_path=trace_path)
+            else:
+                uvm.run(binary_data)
 
             # Получаем результаты
             registers = uvm.get_registers_dump()
             memory = uvm.get_memory_dump(start, end)
 
-            # Выводим регистры
-            self.registers_text.clear()
-            if registers:
-                self.registers_text.append("РЕГИСТРЫ (ненулевые):")
-                self.registers_text.append("=" * 50)
-                for reg in sorted(registers.keys()):
-                    val = registers[reg]
-                    self.registers_text.append(f"{reg}: {val:10d} (0x{val:08X})")
-            else:
-                self.registers_text.append("Все регистры нулевые")
-
-            # Выводим память
-            self.memory_text.clear()
-            if memory:
-                self.memory_text.append(f"ПАМЯТЬ (адреса {start}-{end}, ненулевые):")
-                self.memory_text.append("=" * 50)
-                for addr in sorted(memory.keys()):
-                    val = memory[addr]
-                    self.memory_text.append(f"{addr}: {val:10d} (0x{val:08X})")
-            else:
-                self.memory_text.append(f"В памяти {start}-{end} все значения нулевые")
+            self.trace_range = (start, end)
+            reader = TraceReader(trace_path) if trace_path else None
+            trace_path = None  # файлы трассы теперь удаляет set_trace
+            self.set_trace(reader)
+            self.show_state(registers, memory, start, end)
 
             # Сохраняем в JSON
             result = {
@@ -325,13 +369,71 @@ ROTR 36, 48         ; Циклический сдвиг на 8
             self.log(f"Затронутые адреса памяти: {list(memory.keys())}", "blue")
 
         except Exception as e:
+            if trace_path:
+                remove_trace_files(trace_path)
             self.log(f"Ошибка выполнения: {str(e)}", "red")
 
+    def set_trace(self, reader):
+        """Подключение трассы к элементам пошагового просмотра"""
+        # Файлы предыдущей трассы больше не нужны
+        if self.trace_reader is not None:
+            remove_trace_files(self.trace_reader.path)
+
+        self.trace_reader = reader
+        steps = len(reader) if reader else 0
+
+        for widget in (self.step_slider, self.step_spin):
+            widget.blockSignals(True)
+            widget.setRange(0, steps)
+            widget.setValue(steps)
+            widget.blockSignals(False)
+
+        self.step_label.setText(f"из {steps}")
+        for widget in (self.step_back_btn, self.step_slider, self.step_forward_btn, self.step_spin):
+            widget.setEnabled(reader is not None)
+
+    def show_step(self, step):
+        """Показ состояния после выполнения step команд"""
+        if self.trace_reader is None:
+            return
+
+        try:
+            uvm = UVM(memory_size=self.trace_reader.memory_size)
+            uvm.registers, uvm.memory = self.trace_reader.state_at(step)
+            start, end = self.trace_range
+            self.show_state(uvm.get_registers_dump(), uvm.get_memory_dump(start, end), start, end)
+        except Exception as e:
+            self.log(f"Ошибка чтения трассы: {str(e)}", "red")
+
+    def show_state(self, registers, memory, start, end):
+        """Вывод регистров и памяти во вкладки"""
+        # Выводим регистры
+        self.registers_text.clear()
+        if registers:
+            self.registers_text.append("РЕГИСТРЫ (ненулевые):")
+            self.registers_text.append("=" * 50)
+            for reg in sorted(registers.keys()):
+                val = registers[reg]
+                self.registers_text.append(f"{reg}: {val:10d} (0x{val:08X})")
+        else:
+            self.registers_text.append("Все регистры нулевые")
+
+        # Выводим память
+        self.memory_text.clear()
+        if memory:
+            self.memory_text.append(f"ПАМЯТЬ (адреса {start}-{end}, ненулевые):")
+            self.memory_text.append("=" * 50)
+            for addr in sorted(memory.keys()):
+                val = memory[addr]
+                self.memory_text.append(f"{addr}: {val:10d} (0x{val:08X})")
+        else:
+            self.memory_text.append(f"В памяти {start}-{end} все значения нулевые")
+
     def closeEvent(self, event):
         """Очистка временных файлов при закрытии"""
+        self.set_trace(None)
         for temp_file in self.temp_files:
             try:
-                import os
                 os.unlink(temp_file)
             except:
                 pass
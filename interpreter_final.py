@@ -2,8 +2,27 @@
 Финальная версия интерпретатора УВМ
 """
 
+import asyncio
 import json
+import struct
 import sys
+import time
+
+from tracer import TRACE_MEM, TRACE_NONE, TRACE_REG, TraceWriter
+
+
+class ExecutionLimitError(RuntimeError):
+    """Превышена квота на число команд или время выполнения"""
+
+
+# Команда: A (1 байт), B (3 байта little-endian как H + старший байт), C (1 байт)
+_COMMAND = struct.Struct('<BHBB')
+
+
+def decode_commands(binary_data):
+    """Декодирование программы в список команд (A, B, C); неполная команда в конце отбрасывается"""
+    size = len(binary_data) - len(binary_data) % 5
+    return [(a, low | (high << 16), c) for a, low, high, c in _COMMAND.iter_unpack(binary_data[:size])]
 
 
 class UVM:
@@ -11,6 +30,12 @@ class UVM:
         self.memory_size = memory_size
         self.registers = [0] * 64
         self.memory = [0] * memory_size
+        self.stats = self._new_stats()
+
+    @staticmethod
+    def _new_stats():
+        """Пустая статистика выполнения"""
+        return {'commands': 0}
 
     def decode_command(self, binary):
         """Декодирование 5-байтовой команды"""
@@ -61,20 +86,129 @@ class UVM:
         except Exception as e:
             print(f"Ошибка выполнения: A={a}, B={b}, C={c}: {e}")
 
-    def run(self, binary_data):
-        """Выполнение программы"""
+    def decode_program(self, binary_data):
+        """Декодирование всей программы в список команд (A, B, C)"""
+        return decode_commands(binary_data)
+
+    def command_target(self, a, b, c):
+        """Ячейка, которую может изменить команда: (вид, индекс) для трассы"""
+        if a == 84 and 0 <= c < 64:
+            return TRACE_REG, c
+        if a in (223, 213) and 0 <= b < 64:
+            return TRACE_REG, b
+        if a == 9 and 0 <= b < len(self.memory):
+            return TRACE_MEM, b
+        return TRACE_NONE, 0
+
+    def run(self, binary_data, trace_path=None, checkpoint_interval=1024):
+        """
+        Выполнение программы.
+        При указании trace_path записывается трасса для перехода
+        к состоянию после любой команды (см. tracer.py).
+        """
         # Сброс
         self.registers = [0] * 64
         self.memory = [0] * self.memory_size
+        self.stats = self._new_stats()
+
+        if trace_path is not None:
+            self._run_traced(binary_data, trace_path, checkpoint_interval)
+            return
+
+        execute_command = self.execute_command
+        for a, b, c in self.decode_program(binary_data):
+            execute_command(a, b, c)
+
+        self.stats['commands'] = len(binary_data) // 5
+
+    def _run_traced(self, binary_data, trace_path, checkpoint_interval):
+        """Выполнение с записью изменений после каждой команды"""
+        registers = self.registers
+        memory = self.memory
+
+        with TraceWriter(trace_path, self.memory_size, checkpoint_interval) as trace:
+            trace.checkpoint(registers, memory)
+            for a, b, c in self.decode_program(binary_data):
+                self.execute_command(a, b, c)
+                kind, index = self.command_target(a, b, c)
+                if kind == TRACE_REG:
+                    value = registers[index]
+                elif kind == TRACE_MEM:
+                    value = memory[index]
+                else:
+                    value = 0
+                trace.record(kind, index, value, registers, memory)
+
+        self.stats['commands'] = trace.steps
+
+    async def run_async(self, program, *, instruction_budget=None, time_slice=1024,
+                        time_limit=None, progress=None):
+        """
+        Выполнение программы без блокировки цикла событий asyncio.
+
+        Программа декодируется и выполняется частями по time_slice команд,
+        после каждой части управление возвращается циклу событий, поэтому
+        выполнение можно отменить (task.cancel()), а один цикл событий может
+        поочерёдно выполнять много УВМ.
+
+        instruction_budget - максимум команд в программе (None - без ограничения);
+        time_limit - ограничение времени выполнения в секундах (None - без ограничения);
+        progress - функция progress(выполнено, всего), вызывается после каждого кванта.
+        При превышении квот выбрасывается ExecutionLimitError.
+        """
+        if time_slice < 1:
+            raise ValueError(f"Некорректный квант: {time_slice}")
+
+        started = time.monotonic()
+        self.registers = [0] * 64
+        self.memory = [0] * self.memory_size
+        self.stats = self._new_stats()
+
+        total = len(program) // 5
+        if instruction_budget is not None and total > instruction_budget:
+            # Программа линейная - число команд известно заранее
+            raise ExecutionLimitError(f"Программа из {total} команд превышает квоту {instruction_budget}")
+
+        stats = self.stats
+        execute = self.execute_command
+        step = time_slice * 5
 
-        # Выполнение
-        for i in range(0, len(binary_data), 5):
-            chunk = binary_data[i:i + 5]
-            if len(chunk) < 5:
-                break
+        for offset in range(0, total * 5, step):
+            # Декодирование тоже идёт по частям - до первого await
+            # обрабатывается не больше time_slice команд
+            commands = decode_commands(program[offset:offset + step])
+            for a, b, c in commands:
+                execute(a, b, c)
+            stats['commands'] += len(commands)
 
-            a, b, c = self.decode_command(chunk)
-            self.execute_command(a, b, c)
+            if progress is not None:
+                progress(stats['commands'], total)
+
+            if time_limit is not None and time.monotonic() - started > time_limit:
+                raise ExecutionLimitError(
+                    f"Превышено время выполнения {time_limit} с "
+                    f"(выполнено {stats['commands']} из {total} команд)")
+
+            await asyncio.sleep(0)
+
+    def run_demand(self, binary_data, start=0, end=200, registers=True):
+        """
+        Выполнение только тех команд, от которых зависит результат:
+        память в диапазоне [start, end) и (при registers=True) регистры.
+        Разбираются и выполняются только команды среза (см. compute_slice).
+        Возвращает количество выполненных команд.
+        """
+        self.registers = [0] * 64
+        self.memory = [0] * self.memory_size
+        self.stats = self._new_stats()
+
+        needed = compute_slice(binary_data, start, end, self.memory_size, registers)
+        for index in needed:
+            a, low, high, c = _COMMAND.unpack_from(binary_data, index * 5)
+            self.execute_command(a, low | (high << 16), c)
+
+        self.stats['commands'] = len(needed)
+        return len(needed)
 
     def get_memory_dump(self, start=0, end=200):
         """Дамп памяти"""
@@ -94,17 +228,118 @@ class UVM:
         return dump
 
 
-def run_program(binary_file, start_addr=0, end_addr=200):
+def _find_address(binary_data, index, register, cache):
+    """
+    Адрес памяти в регистре register перед командой index: поиск назад
+    последней команды, записавшей регистр. LOAD даёт константу, READ/ROTR -
+    неизвестное значение (None), если записи нет - регистр нулевой.
+    cache[register] = (позиция начала поиска, результат): обратный проход
+    идёт только вниз, поэтому повторный поиск не просматривает те же команды.
+    """
+    searched_from, found_at, value = cache.get(register, (-1, -1, 0))
+    if found_at < index <= searched_from:
+        return value
+
+    found_at, value = -1, 0
+    for position in range(index - 1, -1, -1):
+        a, low, high, c = _COMMAND.unpack_from(binary_data, position * 5)
+        if a == 84 and c == register:
+            found_at, value = position, low | (high << 16)
+            break
+        if (a == 223 or a == 213) and c < 64 and (low | (high << 16)) == register:
+            found_at, value = position, None
+            break
+
+    cache[register] = (index, found_at, value)
+    return value
+
+
+def compute_slice(binary_data, start, end, memory_size=2048, registers=True):
+    """
+    Обратный срез программы: индексы команд, которые влияют на память
+    в диапазоне [start, end) и (при registers=True) на регистры.
+
+    Команды разбираются с конца прямо из байтов программы. Адреса STORE
+    известны статически (поле B); адрес READ/ROTR определяется только
+    для команды, попавшей в срез, поиском назад последней записи регистра C.
+    Если адрес неизвестен, считается, что команда может читать любую ячейку
+    памяти. Проход останавливается, как только не остаётся живых регистров
+    и ячеек, поэтому время пропорционально срезу, а не всей программе.
+    """
+    live_regs = set(range(64)) if registers else set()
+    live_mem = set(range(max(start, 0), min(end, memory_size)))
+    all_memory_live = False
+    addresses = {}
+    needed = []
+
+    for index in range(len(binary_data) // 5 - 1, -1, -1):
+        if not live_regs and not live_mem and not all_memory_live:
+            # Более ранние команды ни на что не влияют
+            break
+
+        a, low, high, c = _COMMAND.unpack_from(binary_data, index * 5)
+        b = low | (high << 16)
+
+        if a == 84:  # LOAD: R[C] = B
+            if c in live_regs:
+                needed.append(index)
+                live_regs.discard(c)
+
+        elif a == 9:  # STORE: M[B] = R[C]
+            if c < 64 and b < memory_size:
+                if all_memory_live or b in live_mem:
+                    needed.append(index)
+                    live_mem.discard(b)
+                    live_regs.add(c)
+
+        elif a == 223:  # READ: R[B] = M[R[C]]
+            if c < 64 and b in live_regs:
+                addr = _find_address(binary_data, index, c, addresses)
+                if addr is None:
+                    # Запись условная - регистр B остаётся живым
+                    needed.append(index)
+                    live_regs.add(c)
+                    all_memory_live = True
+                elif addr < memory_size:
+                    needed.append(index)
+                    live_regs.discard(b)
+                    live_regs.add(c)
+                    live_mem.add(addr)
+
+        elif a == 213:  # ROTR: R[B] = R[B] >>> M[R[C]]
+            if c < 64 and b in live_regs:
+                addr = _find_address(binary_data, index, c, addresses)
+                if addr is None:
+                    needed.append(index)
+                    live_regs.add(c)
+                    all_memory_live = True
+                elif addr < memory_size:
+                    needed.append(index)
+                    live_regs.add(c)
+                    live_mem.add(addr)
+
+    needed.reverse()
+    return needed
+
+
+def run_program(binary_file, start_addr=0, end_addr=200, demand=False, trace_path=None):
     """Запуск программы"""
     with open(binary_file, 'rb') as f:
         binary = f.read()
 
     uvm = UVM()
-    uvm.run(binary)
+    if demand:
+        executed = uvm.run_demand(binary, start_addr, end_addr)
+    else:
+        uvm.run(binary, trace_path)
 
     print("=" * 50)
     print("ПРОГРАММА ВЫПОЛНЕНА УСПЕШНО!")
     print(f"Размер программы: {len(binary)} байт")
+    if demand:
+        print(f"Выполнено команд (срез): {executed} из {len(binary) // 5}")
+    else:
+        print(f"Выполнено команд: {uvm.stats['commands']}")
     print("=" * 50)
 
     # Регистры
@@ -139,16 +374,25 @@ def run_program(binary_file, start_addr=0, end_addr=200):
         json.dump(dump, f, indent=2)
 
     print(f"\nРезультат сохранен в result.json")
+    if trace_path and not demand:
+        print(f"Трасса сохранена в {trace_path}")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Использование: python interpreter_final.py program.bin [start] [end]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print("Использование: python interpreter_final.py program.bin [start] [end] "
+              "[--demand] [--trace=program.trace]")
         print("Пример: python interpreter_final.py program.bin 0 200")
         sys.exit(1)
 
-    binary_file = sys.argv[1]
-    start = int(sys.argv[2]) if len(sys.argv) > 2 else 0
-    end = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    binary_file = args[0]
+    start = int(args[1]) if len(args) > 1 else 0
+    end = int(args[2]) if len(args) > 2 else 200
+    demand = '--demand' in sys.argv
+    trace_path = None
+    for arg in sys.argv[1:]:
+        if arg.startswith('--trace='):
+            trace_path = arg[len('--trace='):]
 
-    run_program(binary_file, start, end)
\ No newline at end of file
+    run_program(binary_file, start, end, demand, trace_path)
\ No newline at end of file
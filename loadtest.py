@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Нагрузочное тестирование ассемблирования и выполнения программ УВМ
+
+Режимы:
+  inprocess - вызовы assemble_text_to_binary и UVM.run в текущем процессе;
+  http      - запросы к /api/assemble и /api/run запущенного server.py.
+
+Для каждого уровня параллельности выводятся пропускная способность,
+задержки p50/p95/p99 и доля ошибок, для всего прогона - пиковое потребление
+памяти (RSS) процесса. Пик RSS не убывает за время жизни процесса, поэтому
+он один на отчёт, а не на уровень. Результат - JSON, удобный для сравнения версий.
+
+Примеры:
+  python loadtest.py --mode inprocess --concurrency 1,4,16 --sizes uniform:10:1000
+  python server.py --no-browser &
+  python loadtest.py --mode http --url http://localhost:8000 --requests 2000 --output http.json
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from assembler import assemble_text_to_binary
+from interpreter_final import UVM
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def parse_sizes(spec):
+    """
+    Распределение размеров программ (число команд):
+      fixed:N, uniform:MIN:MAX, lognormal:MU:SIGMA
+    Возвращает функцию rng -> размер.
+    """
+    kind, _, params = spec.partition(':')
+    try:
+        values = [float(value) for value in params.split(':')] if params else []
+        if kind == 'fixed' and len(values) == 1:
+            size = int(values[0])
+            return lambda rng: size
+        if kind == 'uniform' and len(values) == 2:
+            low, high = int(values[0]), int(values[1])
+            return lambda rng: rng.randint(low, high)
+        if kind == 'lognormal' and len(values) == 2:
+            mu, sigma = values
+            return lambda rng: max(1, int(rng.lognormvariate(mu, sigma)))
+    except ValueError:
+        pass
+    raise ValueError(f"Некорректное распределение размеров: {spec}")
+
+
+def generate_program(size, rng):
+    """Случайная программа на ассемблере из size команд с типичными последовательностями"""
+    lines = []
+    while len(lines) < size:
+        kind = rng.randrange(4)
+        reg = rng.randrange(64)
+        addr = rng.randrange(2048)
+        if kind == 0:
+            # Подготовка сдвига и ROTR
+            shift_reg = rng.randrange(64)
+            lines += [f"LOAD {rng.randrange(32)}, {reg}", f"STORE {addr}, {reg}",
+                      f"LOAD {addr}, {shift_reg}", f"ROTR {rng.randrange(64)}, {shift_reg}"]
+        elif kind == 1:
+            lines += [f"LOAD {rng.randrange(1 << 24)}, {reg}", f"STORE {addr}, {reg}"]
+        elif kind == 2:
+            lines += [f"LOAD {addr}, {reg}", f"READ {rng.randrange(64)}, {reg}"]
+        else:
+            lines.append(f"LOAD {rng.randrange(1 << 24)}, {reg}")
+    return '\n'.join(lines[:size])
+
+
+def percentile(sorted_values, fraction):
+    """Перцентиль по методу ближайшего ранга"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_kb(pid=None):
+    """Пиковый RSS процесса за всё время его работы в КБ (None, если недоступен)"""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS возвращает байты, Linux - килобайты
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def inprocess_request(operation, source):
+    """Одно ассемблирование (и выполнение) в текущем процессе"""
+    binary_data, _ = assemble_text_to_binary(source)
+    if binary_data is None:
+        raise ValueError("Ошибка ассемблирования")
+    if operation == 'run':
+        uvm = UVM()
+        uvm.run(binary_data)
+        uvm.get_registers_dump()
+        uvm.get_memory_dump(0, 200)
+
+
+def http_request(url, operation, source, timeout):
+    """Один запрос к API server.py"""
+    body = json.dumps({"source": source}).encode('utf-8')
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/api/{operation}", data=body,
+        headers={"Content-Type": "application/json"}, method='POST')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        json.loads(response.read())
+
+
+def run_level(call, programs, concurrency, requests):
+    """Прогон requests запросов с заданной параллельностью"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(index):
+        source = programs[index % len(programs)]
+        started = time.perf_counter()
+        try:
+            call(source)
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+            return
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(requests)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda value: None if value is None else round(value * 1000, 3)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / requests, 6) if requests else 0.0,
+        "duration_s": round(duration, 4),
+        "throughput_rps": round(len(latencies) / duration, 3) if duration > 0 else None,
+        "latency_ms": {
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "p50": ms(percentile(latencies, 0.50)),
+            "p95": ms(percentile(latencies, 0.95)),
+            "p99": ms(percentile(latencies, 0.99)),
+            "max": ms(latencies[-1] if latencies else None)
+        },
+        "sample_errors": sorted(set(errors))[:5]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочное тестирование УВМ")
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--url', default='http://localhost:8000', help="адрес server.py (режим http)")
+    parser.add_argument('--operation', choices=('run', 'assemble'), default='run',
+                        help="run - ассемблирование и выполнение, assemble - только ассемблирование")
+    parser.add_argument('--concurrency', default='1,4,16',
+                        help="уровни параллельности через запятую (по умолчанию 1,4,16)")
+    parser.add_argument('--requests', type=int, default=500, help="запросов на каждый уровень")
+    parser.add_argument('--warmup', type=int, default=20, help="прогревочных запросов (не учитываются)")
+    parser.add_argument('--sizes', default='uniform:10:500',
+                        help="размеры программ: fixed:N, uniform:MIN:MAX, lognormal:MU:SIGMA")
+    parser.add_argument('--programs', type=int, default=100, help="число различных программ")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=30.0, help="таймаут HTTP-запроса, с")
+    parser.add_argument('--server-pid', type=int, help="PID server.py для измерения его пикового RSS")
+    parser.add_argument('--output', help="файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    try:
+        size_of = parse_sizes(args.sizes)
+        levels = [int(level) for level in args.concurrency.split(',')]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.requests < 1 or args.programs < 1 or any(level < 1 for level in levels):
+        parser.error("число запросов, программ и уровни параллельности должны быть положительными")
+
+    rng = random.Random(args.seed)
+    sizes = [size_of(rng) for _ in range(args.programs)]
+    programs = [generate_program(size, rng) for size in sizes]
+
+    if args.mode == 'inprocess':
+        call = lambda source: inprocess_request(args.operation, source)
+    else:
+        call = lambda source: http_request(args.url, args.operation, source, args.timeout)
+
+    if args.warmup:
+        run_level(call, programs, 1, args.warmup)
+
+    results = []
+    for level in levels:
+        result = run_level(call, programs, level, args.requests)
+        results.append(result)
+        print(f"concurrency={level}: {result['throughput_rps']} req/s, "
+              f"p99={result['latency_ms']['p99']} ms, ошибок {result['errors']}", file=sys.stderr)
+
+    report = {
+        "mode": args.mode,
+        "operation": args.operation,
+        "url": args.url if args.mode == 'http' else None,
+        "sizes": {
+            "distribution": args.sizes,
+            "programs": args.programs,
+            "min": min(sizes),
+            "max": max(sizes),
+            "mean": round(sum(sizes) / len(sizes), 1)
+        },
+        "seed": args.seed,
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "process_peak_rss_kb": peak_rss_kb(),
+        "server_peak_rss_kb": peak_rss_kb(args.server_pid) if args.server_pid is not None else None,
+        "levels": results
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f"Отчёт сохранён в {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
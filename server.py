@@ -1,31 +1,393 @@
 """
 Простой сервер для Web/WASM версии
+
+Возможности:
+  - многопоточная обработка запросов (ThreadingHTTPServer);
+  - отдача сжатых gzip-файлов: готовый <file>.gz рядом с файлом
+    или сжатие при первом запросе с кэшированием в памяти;
+  - строгие ETag и условные запросы (If-None-Match -> 304);
+  - локальное зеркало Pyodide по адресу /pyodide/ (для машин без интернета);
+  - режим без открытия браузера (--no-browser);
+  - JSON API: POST /api/assemble и POST /api/run с телом
+    {"source": "<текст программы>", "start": 0, "end": 200};
+    /api/run выполняет не больше MAX_RUN_COMMANDS команд за RUN_TIME_LIMIT с
+    (иначе 413 или 422).
 """
 
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
 import os
+import threading
 import webbrowser
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from assembler import assemble_text_to_binary
+from interpreter_final import UVM, ExecutionLimitError
+
+PYODIDE_PREFIX = '/pyodide'
+
+API_ASSEMBLE = '/api/assemble'
+API_RUN = '/api/run'
+
+# Максимальный размер тела запроса к API
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
+# Квоты /api/run: число команд программы и время выполнения, с
+MAX_RUN_COMMANDS = 100000
+RUN_TIME_LIMIT = 5.0
+
+# Типы файлов, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'application/wasm',
+    'application/xml',
+    'image/svg+xml',
+)
+
+# Файлы меньше этого размера не сжимаются заранее
+PRECOMPRESS_MIN_SIZE = 1024
+
+# Файлы веб-версии в каталоге проекта, которые сжимаются заранее
+WEB_ASSETS = ('index.html',)
+
+
+def guess_type(path):
+    """MIME-тип файла по расширению"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in UVMRequestHandler.extensions_map:
+        return UVMRequestHandler.extensions_map[ext]
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def is_compressible(content_type):
+    """Проверка, стоит ли сжимать файл данного типа"""
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def precompress_file(path):
+    """Создание <file>.gz рядом со сжимаемым файлом; True, если файл создан"""
+    gz_path = path + '.gz'
+    if not is_compressible(guess_type(path)) or os.path.getsize(path) < PRECOMPRESS_MIN_SIZE:
+        return False
+    if os.path.exists(gz_path) and os.path.getmtime(gz_path) >= os.path.getmtime(path):
+        return False
+
+    with open(path, 'rb') as f:
+        data = gzip.compress(f.read(), compresslevel=9, mtime=0)
+    with open(gz_path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def precompress(directory):
+    """Создание <file>.gz для всех сжимаемых файлов каталога (зеркало Pyodide)"""
+    count = 0
+
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith('.gz') and precompress_file(os.path.join(root, name)):
+                count += 1
+
+    return count
+
+
+class UVMRequestHandler(SimpleHTTPRequestHandler):
+    """Обработчик статических файлов со сжатием и кэшированием"""
+
+    extensions_map = {
+        **SimpleHTTPRequestHandler.extensions_map,
+        '.js': 'application/javascript',
+        '.mjs': 'application/javascript',
+        '.json': 'application/json',
+        '.wasm': 'application/wasm',
+        '.asm': 'text/plain',
+        '.data': 'application/octet-stream',
+        '.whl': 'application/octet-stream',
+    }
+
+    # Каталог локального зеркала Pyodide (None - зеркало отключено)
+    pyodide_dir = None
+
+    # Кэш ETag и сжатых данных: путь -> (mtime_ns, размер, значение);
+    # при изменении файла запись заменяется
+    _etag_cache = {}
+    _gzip_cache = {}
+    _cache_lock = threading.Lock()
+
+    def is_pyodide_path(self, path):
+        """Относится ли путь запроса к зеркалу Pyodide (/pyodide или /pyodide/...)"""
+        route = path.split('?', 1)[0].split('#', 1)[0]
+        return bool(self.pyodide_dir) and (route == PYODIDE_PREFIX or route.startswith(PYODIDE_PREFIX + '/'))
+
+    def translate_path(self, path):
+        """Отображение /pyodide/... на каталог зеркала"""
+        if self.is_pyodide_path(path):
+            directory = self.directory
+            self.directory = self.pyodide_dir
+            try:
+                return super().translate_path('/' + path[len(PYODIDE_PREFIX):].lstrip('/'))
+            finally:
+                self.directory = directory
+        return super().translate_path(path)
+
+    def send_head(self):
+        """Отправка заголовков с учётом gzip, ETag и Cache-Control"""
+        path = self.translate_path(self.path)
+
+        if os.path.isdir(path):
+            if not self.path.split('?', 1)[0].endswith('/'):
+                # Перенаправление на путь с завершающим /
+                return super().send_head()
+            for index in ('index.html', 'index.htm'):
+                if os.path.isfile(os.path.join(path, index)):
+                    path = os.path.join(path, index)
+                    break
+            else:
+                if self.is_pyodide_path(self.path):
+                    # Содержимое зеркала не показывается списком
+                    self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+                    return None
+                return super().send_head()
 
+        if not os.path.isfile(path):
+            return super().send_head()
 
-def run_server(port=8000):
+        content_type = guess_type(path)
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+
+        body, etag, encoding = None, None, None
+        if self.accepts_gzip():
+            gz_path = path + '.gz'
+            if os.path.isfile(gz_path) and os.stat(gz_path).st_mtime_ns >= stat.st_mtime_ns:
+                gz_stat = os.stat(gz_path)
+                path = gz_path
+                etag = self.file_etag((gz_path, gz_stat.st_mtime_ns, gz_stat.st_size))
+                encoding = 'gzip'
+            elif is_compressible(content_type):
+                body, etag = self.compressed(key)
+                encoding = 'gzip'
+
+        if etag is None:
+            etag = self.file_etag(key)
+
+        if self.etag_matches(etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_cache_headers(etag)
+            self.end_headers()
+            return None
+
+        if body is not None:
+            f = io.BytesIO(body)
+            length = len(body)
+        else:
+            try:
+                f = open(path, 'rb')
+            except OSError:
+                self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+                return None
+            length = os.fstat(f.fileno()).st_size
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_cache_headers(etag)
+        self.end_headers()
+        return f
+
+    def do_POST(self):
+        """JSON API для ассемблирования и выполнения программ"""
+        route = self.path.split('?', 1)[0]
+        if route not in (API_ASSEMBLE, API_RUN):
+            self.send_error(HTTPStatus.NOT_FOUND, "Unknown API endpoint")
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_REQUEST_SIZE:
+            self.send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Некорректный размер запроса"})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length))
+            source = request['source']
+            start = int(request.get('start', 0))
+            end = int(request.get('end', 200))
+            if not isinstance(source, str):
+                raise TypeError("source")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": "Ожидается JSON с полем source"})
+            return
+
+        binary_data, ir = assemble_text_to_binary(source)
+        if binary_data is None:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": "Ошибка ассемблирования"})
+            return
+
+        if route == API_ASSEMBLE:
+            self.send_json(HTTPStatus.OK, {
+                "binary": binary_data.hex(),
+                "size": len(binary_data),
+                "commands": len(ir)
+            })
+            return
+
+        commands = len(binary_data) // 5
+        if commands > MAX_RUN_COMMANDS:
+            self.send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {
+                "error": f"Программа из {commands} команд превышает квоту {MAX_RUN_COMMANDS}"})
+            return
+
+        uvm = UVM()
+        try:
+            asyncio.run(uvm.run_async(binary_data, instruction_budget=MAX_RUN_COMMANDS,
+                                      time_limit=RUN_TIME_LIMIT))
+        except ExecutionLimitError as e:
+            self.send_json(HTTPStatus.UNPROCESSABLE_ENTITY, {"error": str(e)})
+            return
+
+        self.send_json(HTTPStatus.OK, {
+            "registers": uvm.get_registers_dump(),
+            "memory": uvm.get_memory_dump(start, end),
+            "stats": uvm.stats
+        })
+
+    def send_json(self, status, payload):
+        """Отправка JSON-ответа"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def accepts_gzip(self):
+        """Поддерживает ли клиент gzip"""
+        for item in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = item.partition(';')
+            if name.strip().lower() not in ('gzip', '*'):
+                continue
+            params = params.replace(' ', '')
+            if params.startswith('q='):
+                try:
+                    return float(params[2:]) > 0
+                except ValueError:
+                    return False
+            return True
+        return False
+
+    def etag_matches(self, etag):
+        """Совпадает ли ETag с If-None-Match"""
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        if header.strip() == '*':
+            return True
+        return etag in (tag.strip() for tag in header.split(','))
+
+    def send_cache_headers(self, etag):
+        """ETag, Vary и Cache-Control"""
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept-Encoding")
+        if self.is_pyodide_path(self.path):
+            # Файлы зеркала привязаны к версии Pyodide и не меняются
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            self.send_header("Cache-Control", "no-cache")
+
+    def file_etag(self, key):
+        """Строгий ETag по содержимому файла"""
+        path, mtime_ns, size = key
+        with self._cache_lock:
+            cached = self._etag_cache.get(path)
+        if cached is not None and cached[:2] == (mtime_ns, size):
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        with self._cache_lock:
+            self._etag_cache[path] = (mtime_ns, size, etag)
+        return etag
+
+    def compressed(self, key):
+        """Сжатие файла при первом запросе с кэшированием"""
+        path, mtime_ns, size = key
+        with self._cache_lock:
+            cached = self._gzip_cache.get(path)
+        if cached is not None and cached[:2] == (mtime_ns, size):
+            return cached[2]
+
+        with open(path, 'rb') as f:
+            body = gzip.compress(f.read(), compresslevel=6, mtime=0)
+        result = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        with self._cache_lock:
+            self._gzip_cache[path] = (mtime_ns, size, result)
+        return result
+
+
+def run_server(port=8000, bind='', pyodide_dir=None, open_browser=True, precompress_assets=False):
     """Запуск локального сервера"""
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    root = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(root)
+
+    if pyodide_dir:
+        pyodide_dir = os.path.abspath(pyodide_dir)
+        if not os.path.isdir(pyodide_dir):
+            raise SystemExit(f"Каталог Pyodide не найден: {pyodide_dir}")
+        UVMRequestHandler.pyodide_dir = pyodide_dir
+        print(f"📦 Локальное зеркало Pyodide: {pyodide_dir}")
+
+    if precompress_assets:
+        count = sum(precompress_file(os.path.join(root, name)) for name in WEB_ASSETS)
+        if pyodide_dir:
+            count += precompress(pyodide_dir)
+        print(f"🗜  Подготовлено сжатых файлов: {count}")
 
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, SimpleHTTPRequestHandler)
+    server_address = (bind, port)
+    httpd = ThreadingHTTPServer(server_address, UVMRequestHandler)
 
     url = f"http://localhost:{port}"
     print(f"🚀 Сервер запущен на {url}")
-    print("📂 Открываю браузер...")
 
-    # Открываем браузер
-    webbrowser.open(url)
+    if open_browser:
+        print("📂 Открываю браузер...")
+        webbrowser.open(url)
 
     try:
         httpd.serve_forever()
     except KeyboardInterrupt:
         print("\n👋 Сервер остановлен")
+    finally:
+        httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер для Web/WASM версии УВМ")
+    parser.add_argument('--port', type=int, default=8000, help="порт (по умолчанию 8000)")
+    parser.add_argument('--bind', default='', help="адрес для прослушивания (по умолчанию все)")
+    parser.add_argument('--pyodide-dir', help="каталог с локальной копией Pyodide, отдаётся по /pyodide/")
+    parser.add_argument('--no-browser', action='store_true', help="не открывать браузер")
+    parser.add_argument('--precompress', action='store_true', help="заранее создать .gz для index.html и зеркала Pyodide")
+    args = parser.parse_args()
+
+    run_server(args.port, args.bind, args.pyodide_dir, not args.no_browser, args.precompress)
 
 
 if __name__ == "__main__":
-    run_server()
\ No newline at end of file
+    main()
\ No newline at end of file
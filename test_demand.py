@@ -0,0 +1,87 @@
+"""
+Проверка UVM.run_demand: память в запрошенном диапазоне и регистры
+должны совпадать с полным выполнением UVM.run
+
+Запуск: python -m unittest test_demand
+"""
+
+import random
+import unittest
+
+from interpreter_final import UVM
+from test_run import LOAD, READ, ROTR, STORE, program
+
+
+class DemandTest(unittest.TestCase):
+
+    def assertSameRange(self, binary_data, start, end):
+        expected = UVM()
+        expected.run(binary_data)
+        low, high = max(start, 0), max(end, 0)
+        for registers in (True, False):
+            uvm = UVM()
+            executed = uvm.run_demand(binary_data, start, end, registers=registers)
+            with self.subTest(start=start, end=end, registers=registers):
+                self.assertEqual(uvm.memory[low:high], expected.memory[low:high])
+                if registers:
+                    self.assertEqual(uvm.registers, expected.registers)
+                self.assertEqual(uvm.stats['commands'], executed)
+                self.assertLessEqual(executed, len(binary_data) // 5)
+
+    def test_store_chain(self):
+        self.assertSameRange(program(
+            (LOAD, 7, 1), (STORE, 10, 1), (LOAD, 10, 2), (READ, 3, 2), (STORE, 20, 3)), 20, 21)
+
+    def test_unloaded_registers(self):
+        # Незагруженный регистр содержит 0 - READ/ROTR обращаются к ячейке 0
+        self.assertSameRange(program(
+            (LOAD, 5, 1), (STORE, 0, 1), (READ, 4, 9), (STORE, 30, 4)), 30, 31)
+        self.assertSameRange(program(
+            (LOAD, 3, 1), (STORE, 0, 1), (LOAD, 0x80, 6), (ROTR, 6, 9), (STORE, 31, 6)), 31, 32)
+
+    def test_unknown_addresses(self):
+        # Адрес получен через READ - срез считает живой всю память
+        self.assertSameRange(program(
+            (LOAD, 40, 1), (STORE, 5, 1), (LOAD, 99, 2), (STORE, 40, 2),
+            (LOAD, 5, 3), (READ, 4, 3), (READ, 6, 4), (STORE, 50, 6)), 50, 51)
+
+    def test_out_of_range(self):
+        self.assertSameRange(program(
+            (LOAD, 9, 1), (STORE, 2048, 1), (STORE, 5000, 70), (LOAD, 4000, 2),
+            (READ, 3, 2), (READ, 64, 2), (ROTR, 3, 2), (LOAD, 1, 64), (STORE, 2047, 1)), 2000, 2100)
+
+    def test_empty_and_inverted_ranges(self):
+        binary_data = program((LOAD, 9, 1), (STORE, 3, 1), (LOAD, 3, 2), (ROTR, 1, 2))
+        for start, end in ((3, 3), (10, 2), (-5, 0), (3000, 4000)):
+            self.assertSameRange(binary_data, start, end)
+        self.assertEqual(UVM().run_demand(binary_data, 10, 2, registers=False), 0)
+
+    def test_trailing_partial_command(self):
+        self.assertSameRange(program((LOAD, 1, 1), (STORE, 2, 1)) + b'\x09\x02\x00', 0, 10)
+
+    def test_slice_skips_unrelated_commands(self):
+        commands = [(LOAD, i, i % 64) for i in range(5000)] + [(LOAD, 8, 1), (STORE, 100, 1)]
+        uvm = UVM()
+        self.assertEqual(uvm.run_demand(program(*commands), 100, 101, registers=False), 2)
+        self.assertEqual(uvm.memory[100], 8)
+
+    def test_random_programs(self):
+        rng = random.Random(2)
+        register = lambda: rng.choice([rng.randrange(8), rng.randrange(70)])
+        address = lambda: rng.choice([rng.randrange(32), rng.randrange(2040, 2060)])
+        for _ in range(500):
+            commands = []
+            for _ in range(rng.randrange(1, 60)):
+                a = rng.choice((LOAD, LOAD, STORE, STORE, READ, ROTR, 7))
+                if a == LOAD:
+                    commands.append((a, rng.choice([address(), rng.randrange(1 << 24)]), register()))
+                elif a == STORE:
+                    commands.append((a, address(), register()))
+                else:
+                    commands.append((a, register(), register()))
+            start = rng.randrange(-2, 40)
+            self.assertSameRange(program(*commands), start, start + rng.randrange(-3, 12))
+
+
+if __name__ == '__main__':
+    unittest.main()
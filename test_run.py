@@ -0,0 +1,115 @@
+"""
+Проверка UVM.run: декодирование программы через struct должно давать
+тот же результат, что и последовательное выполнение execute_command
+
+Запуск: python -m unittest test_run
+"""
+
+import random
+import unittest
+
+from interpreter_final import UVM
+
+LOAD, READ, STORE, ROTR = 84, 223, 9, 213
+
+
+def enc(a, b, c):
+    """Кодирование команды без особых случаев ассемблера"""
+    return bytes([a]) + b.to_bytes(3, 'little') + bytes([c])
+
+
+def program(*commands):
+    return b''.join(enc(*command) for command in commands)
+
+
+def run_sequential(binary_data):
+    """Эталон: исходный цикл интерпретации по 5 байт"""
+    uvm = UVM()
+    for i in range(0, len(binary_data), 5):
+        chunk = binary_data[i:i + 5]
+        if len(chunk) < 5:
+            break
+        uvm.execute_command(*uvm.decode_command(chunk))
+    return uvm
+
+
+class RunTest(unittest.TestCase):
+
+    def assertSameState(self, binary_data):
+        expected = run_sequential(binary_data)
+        uvm = UVM()
+        uvm.run(binary_data)
+        self.assertEqual(uvm.registers, expected.registers)
+        self.assertEqual(uvm.memory, expected.memory)
+        self.assertEqual(uvm.stats['commands'], len(binary_data) // 5)
+
+    def test_rotr_idiom(self):
+        self.assertSameState(program(
+            (LOAD, 0x345678, 20),
+            (LOAD, 4, 0), (STORE, 100, 0), (LOAD, 100, 22), (ROTR, 20, 22)))
+
+    def test_rotr_aliasing(self):
+        # rv == r0, rv == rX, r0 == rX
+        for r0, rx, rv in ((5, 6, 5), (5, 6, 6), (5, 5, 7), (5, 5, 5)):
+            with self.subTest(r0=r0, rx=rx, rv=rv):
+                self.assertSameState(program(
+                    (LOAD, 0xABCDEF, rv if rv not in (r0, rx) else 9),
+                    (LOAD, 8, r0), (STORE, 300, r0), (LOAD, 300, rx), (ROTR, rv, rx)))
+
+    def test_rotr_zero_shift(self):
+        self.assertSameState(program(
+            (LOAD, 77, 1), (LOAD, 32, 2), (STORE, 10, 2), (LOAD, 10, 3), (ROTR, 1, 3)))
+
+    def test_out_of_range_operands(self):
+        cases = [
+            # STORE/ROTR по адресу вне памяти
+            [(LOAD, 3, 1), (STORE, 2048, 1), (LOAD, 2048, 2), (ROTR, 4, 2)],
+            [(LOAD, 3, 1), (STORE, 5000, 1)],
+            # регистры вне диапазона
+            [(LOAD, 3, 64), (STORE, 10, 64), (LOAD, 10, 2), (ROTR, 4, 2)],
+            [(LOAD, 3, 1), (STORE, 10, 1), (LOAD, 10, 70), (ROTR, 4, 70)],
+            [(LOAD, 3, 1), (STORE, 10, 1), (LOAD, 10, 2), (ROTR, 99, 2)],
+            # READ по адресу вне памяти и в регистр вне диапазона
+            [(LOAD, 5, 1), (STORE, 7, 1), (LOAD, 4000, 3), (READ, 4, 3)],
+            [(LOAD, 5, 1), (STORE, 7, 1), (LOAD, 7, 3), (READ, 64, 3)],
+            [(LOAD, 5, 1), (STORE, 7, 1), (LOAD, 7, 3), (READ, 3, 3)],
+        ]
+        for commands in cases:
+            with self.subTest(commands=commands):
+                self.assertSameState(program(*commands))
+
+    def test_trailing_partial_command(self):
+        binary_data = program((LOAD, 1, 1), (STORE, 2, 1), (LOAD, 2, 3), (READ, 4, 3))
+        for extra in (b'\x54', b'\x54\x01\x00', b'\x09\x02\x00\x00'):
+            with self.subTest(extra=extra):
+                self.assertSameState(binary_data + extra)
+
+    def test_large_operands(self):
+        # B занимает 3 байта: старший байт декодируется отдельно
+        self.assertSameState(program(
+            (LOAD, 0xFFFFFF, 1), (LOAD, 0x010000, 2), (STORE, 0x0007FF, 1),
+            (LOAD, 0x0007FF, 3), (READ, 4, 3), (STORE, 0x010005, 2)))
+
+    def test_random_programs(self):
+        rng = random.Random(1)
+        register = lambda: rng.choice([rng.randrange(64), rng.randrange(70)])
+        address = lambda: rng.choice([rng.randrange(40), rng.randrange(2040, 2060)])
+        for _ in range(300):
+            commands = []
+            for _ in range(rng.randrange(1, 40)):
+                kind = rng.randrange(4)
+                r0, rx, rv, addr = register(), register(), register(), address()
+                if kind == 0:
+                    commands += [(LOAD, rng.randrange(1 << 24), r0), (STORE, addr, r0),
+                                 (LOAD, addr, rx), (ROTR, rv, rx)]
+                elif kind == 1:
+                    commands += [(LOAD, rng.randrange(1 << 24), r0), (STORE, addr, r0)]
+                elif kind == 2:
+                    commands += [(LOAD, addr, r0), (READ, rv, r0)]
+                else:
+                    commands.append((rng.choice((LOAD, READ, STORE, ROTR)), address(), register()))
+            self.assertSameState(program(*commands))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Проверка трассы выполнения: TraceReader.state_at(n) должен совпадать
+с состоянием после последовательного выполнения первых n команд
+
+Запуск: python -m unittest test_tracer
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+from interpreter_final import UVM, decode_commands
+from test_run import LOAD, READ, ROTR, STORE, program
+from tracer import TraceReader
+
+
+def states_after_each_command(binary_data):
+    """Эталон: состояние до первой команды и после каждой следующей"""
+    uvm = UVM()
+    states = [(list(uvm.registers), list(uvm.memory))]
+    for a, b, c in decode_commands(binary_data):
+        uvm.execute_command(a, b, c)
+        states.append((list(uvm.registers), list(uvm.memory)))
+    return states
+
+
+def random_program(rng, size):
+    register = lambda: rng.choice([rng.randrange(8), rng.randrange(70)])
+    commands = []
+    for _ in range(size):
+        a = rng.choice((LOAD, LOAD, STORE, READ, ROTR, 7))
+        if a == LOAD:
+            commands.append((a, rng.choice([rng.randrange(40), rng.randrange(1 << 24)]), register()))
+        elif a == STORE:
+            commands.append((a, rng.choice([rng.randrange(40), rng.randrange(2040, 2060)]), register()))
+        else:
+            commands.append((a, register(), register()))
+    return program(*commands)
+
+
+class TraceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'program.trace')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self, binary_data, checkpoint_interval):
+        UVM().run(binary_data, trace_path=self.path, checkpoint_interval=checkpoint_interval)
+        return TraceReader(self.path)
+
+    def assertTraceMatches(self, binary_data, checkpoint_interval):
+        reader = self.record(binary_data, checkpoint_interval)
+        states = states_after_each_command(binary_data)
+        self.assertEqual(len(reader), len(states) - 1)
+        for step, state in enumerate(states):
+            with self.subTest(interval=checkpoint_interval, step=step):
+                self.assertEqual(reader.state_at(step), state)
+
+    def test_intervals(self):
+        # 12 команд: интервалы 1, 3, 4, 12 делят число команд, 5 и 1024 - нет
+        binary_data = random_program(random.Random(3), 12)
+        for interval in (1, 3, 4, 5, 12, 1024):
+            self.assertTraceMatches(binary_data, interval)
+
+    def test_random_programs(self):
+        rng = random.Random(4)
+        for _ in range(40):
+            binary_data = random_program(rng, rng.randrange(1, 60))
+            self.assertTraceMatches(binary_data, rng.choice((1, 2, 7, 16)))
+
+    def test_trailing_partial_command(self):
+        self.assertTraceMatches(program((LOAD, 5, 1), (STORE, 3, 1)) + b'\x54\x01', 1)
+
+    def test_empty_program(self):
+        reader = self.record(b'', 4)
+        self.assertEqual(len(reader), 0)
+        self.assertEqual(reader.state_at(0), ([0] * 64, [0] * 2048))
+        with self.assertRaises(ValueError):
+            reader.state_at(1)
+
+    def test_step_out_of_range(self):
+        reader = self.record(program((LOAD, 5, 1), (STORE, 3, 1), (LOAD, 3, 2)), 2)
+        for step in (-1, 4, 100):
+            with self.subTest(step=step):
+                with self.assertRaises(ValueError):
+                    reader.state_at(step)
+
+
+if __name__ == '__main__':
+    unittest.main()
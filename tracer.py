@@ -0,0 +1,185 @@
+"""
+Запись и воспроизведение трассы выполнения УВМ ("машина времени")
+
+Формат трассы (little-endian):
+  заголовок:   b'UVMT', версия (H), число регистров (H),
+               размер памяти (I), интервал контрольных точек (I)
+  тело:        контрольная точка (все регистры и вся память, по I на ячейку),
+               затем до interval записей изменений по 7 байт:
+               вид (B: 0 - нет, 1 - регистр, 2 - память), индекс (H), значение (I)
+               и так далее, пока не закончится программа.
+
+Индекс (файл <trace>.idx):
+  b'UVMI', число команд (Q), затем пары (номер команды (Q), смещение (Q))
+  для каждой контрольной точки.
+
+Переход к состоянию после команды N читает ближайшую контрольную точку
+и применяет не более interval записей изменений.
+"""
+
+import bisect
+import json
+import os
+import struct
+import sys
+
+TRACE_MAGIC = b'UVMT'
+INDEX_MAGIC = b'UVMI'
+TRACE_VERSION = 1
+
+TRACE_NONE = 0
+TRACE_REG = 1
+TRACE_MEM = 2
+
+REGISTER_COUNT = 64
+
+_HEADER = struct.Struct('<4sHHII')
+_DELTA = struct.Struct('<BHI')
+_INDEX_HEADER = struct.Struct('<4sQ')
+_INDEX_ENTRY = struct.Struct('<QQ')
+
+
+def index_path(trace_path):
+    """Путь к файлу индекса для трассы"""
+    return trace_path + '.idx'
+
+
+def remove_trace_files(trace_path):
+    """Удаление файлов трассы и её индекса (отсутствующие файлы пропускаются)"""
+    for path in (trace_path, index_path(trace_path)):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+class TraceWriter:
+    """Запись трассы: изменения после каждой команды и контрольные точки"""
+
+    def __init__(self, path, memory_size=2048, checkpoint_interval=1024):
+        if checkpoint_interval < 1:
+            raise ValueError(f"Некорректный интервал контрольных точек: {checkpoint_interval}")
+        if memory_size > 0xFFFF:
+            raise ValueError(f"Размер памяти слишком большой для трассы: {memory_size}")
+
+        self.path = path
+        self.memory_size = memory_size
+        self.checkpoint_interval = checkpoint_interval
+        self.steps = 0
+        self.checkpoints = []
+
+        self._state = struct.Struct(f'<{REGISTER_COUNT + memory_size}I')
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, REGISTER_COUNT,
+                                      memory_size, checkpoint_interval))
+
+    def checkpoint(self, registers, memory):
+        """Запись полного состояния машины"""
+        self.checkpoints.append((self.steps, self._file.tell()))
+        self._file.write(self._state.pack(*registers, *memory))
+
+    def record(self, kind, index, value, registers, memory):
+        """Запись изменения после очередной команды"""
+        self._file.write(_DELTA.pack(kind, index, value))
+        self.steps += 1
+        if self.steps % self.checkpoint_interval == 0:
+            self.checkpoint(registers, memory)
+
+    def close(self):
+        """Завершение трассы и запись индекса"""
+        self._file.close()
+        with open(index_path(self.path), 'wb') as f:
+            f.write(_INDEX_HEADER.pack(INDEX_MAGIC, self.steps))
+            for entry in self.checkpoints:
+                f.write(_INDEX_ENTRY.pack(*entry))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class TraceReader:
+    """Чтение трассы и переход к состоянию после произвольной команды"""
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            raise ValueError(f"Файл трассы повреждён: {path}")
+        magic, version, register_count, memory_size, interval = _HEADER.unpack(header)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"Неизвестный формат трассы: {path}")
+
+        self.register_count = register_count
+        self.memory_size = memory_size
+        self.checkpoint_interval = interval
+        self._state = struct.Struct(f'<{register_count + memory_size}I')
+
+        with open(index_path(path), 'rb') as f:
+            data = f.read()
+        magic, self.steps = _INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Неизвестный формат индекса: {index_path(path)}")
+        entries = list(_INDEX_ENTRY.iter_unpack(data[_INDEX_HEADER.size:]))
+        self._steps = [step for step, _ in entries]
+        self._offsets = [offset for _, offset in entries]
+
+    def __len__(self):
+        return self.steps
+
+    def state_at(self, step):
+        """Регистры и память после выполнения step команд (0 - начальное состояние)"""
+        if not 0 <= step <= self.steps:
+            raise ValueError(f"Номер команды вне трассы: {step} (всего {self.steps})")
+
+        position = bisect.bisect_right(self._steps, step) - 1
+        base = self._steps[position]
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offsets[position])
+            values = self._state.unpack(f.read(self._state.size))
+            deltas = f.read((step - base) * _DELTA.size)
+
+        registers = list(values[:self.register_count])
+        memory = list(values[self.register_count:])
+
+        for kind, index, value in _DELTA.iter_unpack(deltas):
+            if kind == TRACE_REG:
+                registers[index] = value
+            elif kind == TRACE_MEM:
+                memory[index] = value
+
+        return registers, memory
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Использование: python tracer.py program.trace N [start] [end]")
+        print("Пример: python tracer.py program.trace 10 0 200")
+        sys.exit(1)
+
+    reader = TraceReader(sys.argv[1])
+    step = int(sys.argv[2])
+    start = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    end = int(sys.argv[4]) if len(sys.argv) > 4 else 200
+
+    registers, memory = reader.state_at(step)
+    dump = {
+        "registers": {f"R{i:02d}": val for i, val in enumerate(registers) if val != 0},
+        "memory": {f"0x{addr:04X}": memory[addr]
+                   for addr in range(start, min(end, len(memory))) if memory[addr] != 0},
+        "info": {
+            "step": step,
+            "total_steps": len(reader),
+            "memory_range": f"{start}-{end}"
+        }
+    }
+    print(json.dumps(dump, indent=2))
+
+
+if __name__ == "__main__":
+    main()